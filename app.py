@@ -4,9 +4,12 @@ Filter by housing costs, politics, gun laws, population, exotic animals, and mar
 """
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 
+from prepare_data import CATEGORY_ORDERS
+
 # Page config
 st.set_page_config(
     page_title="Home Locator",
@@ -14,12 +17,199 @@ st.set_page_config(
     layout="wide"
 )
 
-# Load data
-@st.cache_data
+# Sidebar filter categories
+LEAN_CATEGORIES = CATEGORY_ORDERS['political_lean']
+GUN_LAW_CATEGORIES = CATEGORY_ORDERS['gun_law_strength']
+
+# Data table columns following the county, state and price columns
+BASE_DISPLAY_COLS = ('population', 'political_lean', 'gun_law_grade', 'lean_score')
+BASE_DISPLAY_NAMES = ('Population', 'Political Lean', 'Gun Grade', 'Lean Score')
+
+# Map hover fields following the price; columns missing from the data are skipped
+MAP_HOVER_DATA = {
+    'population': ':,',
+    'political_lean': True,
+    'gun_law_grade': True,
+    'marijuana_status': True,
+    'exotic_animal_rating': True
+}
+
+# Most markers drawn on the map; larger results show the most populous counties
+MAP_MAX_MARKERS = 500
+
+# Tables longer than this show only the top rows for the chosen sort unless "show all" is ticked
+TABLE_PREVIEW_THRESHOLD = 1000
+TABLE_PREVIEW_ROWS = 200
+
+# Load data - one shared frame (cache_resource, no per-call copy); callers must not modify it
+@st.cache_resource
 def load_data():
-    return pd.read_csv('data/merged_county_data.csv')
+    df = pd.read_feather('data/merged_county_data.feather')
+
+    # Low-cardinality filter columns as categoricals so isin/value_counts work on codes
+    for col in ['political_lean', 'gun_law_strength', 'gun_law_grade', 'marijuana_status', 'exotic_animal_rating',
+                'state_code', 'state_name', 'allows_primates', 'allows_big_cats', 'allows_reptiles']:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    # Population fits in uint32; prices stay float64 (float32 would round the fractional ZHVI values)
+    df['population'] = pd.to_numeric(df['population'], downcast='unsigned')
+
+    # Slider bounds, computed once per load (price max rounded up so the full range includes every county)
+    bounds = {'population': (int(df['population'].min()), int(df['population'].max()))}
+    for col in ['median_home_value_all', 'median_home_value_4br', 'median_home_value_5br']:
+        if col in df.columns:
+            bounds[col] = (int(df[col].min()), int(np.ceil(df[col].max())))
+
+    return df, bounds
+
+# Result when every filter is at its default - the rows apply_filters keeps, i.e. no NaN in any filtered column
+@st.cache_data
+def priced_index(price_col):
+    df, _ = load_data()
+    cols = [price_col, 'population', 'political_lean', 'gun_law_strength']
+    cols += [col for col in ['marijuana_status', 'exotic_animal_rating'] if col in df.columns]
+    return df.index[df[cols].notna().all(axis=1).values].to_numpy()
+
+# Filter counties - cached on widget state (bounded, one index array per entry), returns only the matching index
+@st.cache_data(max_entries=100)
+def apply_filters(price_col, price_min, price_max, selected_leans, selected_gun_laws,
+                  selected_marijuana, selected_exotic_ratings, filter_primates, filter_big_cats,
+                  filter_reptiles, pop_min, pop_max, selected_states):
+    df, _ = load_data()
+
+    # Build a single boolean mask and slice once (NaN prices fail the range check)
+    mask = (
+        (df[price_col].values >= price_min) &
+        (df[price_col].values <= price_max) &
+        (df['population'].values >= pop_min) &
+        (df['population'].values <= pop_max)
+    )
+    mask &= df['political_lean'].isin(selected_leans).values
+    mask &= df['gun_law_strength'].isin(selected_gun_laws).values
+
+    # Marijuana filter
+    if selected_marijuana is not None:
+        mask &= df['marijuana_status'].isin(selected_marijuana).values
+
+    # Exotic animal filters
+    if selected_exotic_ratings is not None:
+        mask &= df['exotic_animal_rating'].isin(selected_exotic_ratings).values
+
+        # Individual animal filters
+        if filter_primates and 'allows_primates' in df.columns:
+            mask &= df['allows_primates'].isin(['Yes', 'Limited']).values
+        if filter_big_cats and 'allows_big_cats' in df.columns:
+            mask &= df['allows_big_cats'].isin(['Yes', 'Limited']).values
+        if filter_reptiles and 'allows_reptiles' in df.columns:
+            mask &= (df['allows_reptiles'] == 'Yes').values
+
+    if selected_states:
+        mask &= df['state_name'].isin(selected_states).values
+
+    return df.index[mask].to_numpy()
+
+# Category counts for the filtered counties, most common first (like value_counts, without zeros)
+def category_counts(col, filtered_idx):
+    column = load_data()[0].loc[filtered_idx, col]
+    codes = column.cat.codes.to_numpy()
+    counts = np.bincount(codes[codes >= 0], minlength=len(column.cat.categories))
+    counts = pd.Series(counts, index=column.cat.categories)
+    return counts[counts > 0].sort_values(ascending=False)
+
+# CSV export of the filtered counties - cached so reruns don't re-serialize
+@st.cache_data(max_entries=20)
+def make_csv(filtered_idx):
+    return load_data()[0].loc[filtered_idx].to_csv(index=False).encode('utf-8')
+
+# Chart builders - cached on the filtered index (bounded, one figure dict per entry), return plain figure dicts
+@st.cache_data(max_entries=50)
+def build_map(filtered_idx, price_col):
+    filtered_df = load_data()[0].loc[filtered_idx]
+    if len(filtered_df) > MAP_MAX_MARKERS:
+        plot_df = filtered_df.nlargest(MAP_MAX_MARKERS, 'population')
+    else:
+        plot_df = filtered_df
+    fig = px.scatter_geo(
+        plot_df,
+        locations='state_code',
+        locationmode='USA-states',
+        color=price_col,
+        hover_name='county_name',
+        hover_data={
+            'state_code': False,
+            price_col: ':$,.0f',
+            **{col: fmt for col, fmt in MAP_HOVER_DATA.items() if col in plot_df.columns}
+        },
+        size='population',
+        color_continuous_scale='Viridis',
+        scope='usa',
+        title=f'{len(filtered_df)} Counties Matching Your Criteria'
+    )
+    
+    fig.update_layout(
+        height=600,
+        geo=dict(
+            scope='usa',
+            showland=True,
+            landcolor='rgb(243, 243, 243)',
+            coastlinecolor='rgb(204, 204, 204)',
+        )
+    )
+    return fig.to_dict()
+
+@st.cache_data(max_entries=50)
+def build_count_pie(col, filtered_idx, title):
+    counts = category_counts(col, filtered_idx)
+    fig = px.pie(
+        values=counts.values,
+        names=counts.index,
+        title=title
+    )
+    return fig.to_dict()
+
+@st.cache_data(max_entries=50)
+def build_count_bar(col, filtered_idx, title, x_label, sort_index=False):
+    counts = category_counts(col, filtered_idx)
+    if sort_index:
+        counts = counts.sort_index()
+    fig = px.bar(
+        x=counts.index,
+        y=counts.values,
+        title=title,
+        labels={'x': x_label, 'y': 'Number of Counties'}
+    )
+    return fig.to_dict()
+
+@st.cache_data(max_entries=50)
+def build_scatter(filtered_idx, price_col, bedroom_type):
+    fig = px.scatter(
+        load_data()[0].loc[filtered_idx],
+        x='population',
+        y=price_col,
+        color='political_lean',
+        hover_name='county_name',
+        title=f'{bedroom_type} Value vs Population',
+        labels={
+            'population': 'Population',
+            price_col: f'{bedroom_type} Median Value ($)'
+        }
+    )
+    fig.update_xaxes(type='log')
+    return fig.to_dict()
+
+# Top n rows by one column - partial selection instead of a full sort where possible
+def top_rows(frame, by, ascending, n):
+    key = frame[by]
+    if isinstance(key.dtype, pd.CategoricalDtype):
+        # sort_values orders categoricals by category order, i.e. by their codes
+        key = key.cat.codes.where(key.notna())
+    if pd.api.types.is_numeric_dtype(key):
+        top = key.nsmallest(n) if ascending else key.nlargest(n)
+        return frame.loc[top.index]
+    return frame.sort_values(by=by, ascending=ascending).head(n)
 
-df = load_data()
+df, bounds = load_data()
 
 # Header
 st.title("🏠 Home Locator")
@@ -52,42 +242,39 @@ else:
     price_col = 'median_home_value_all'
     price_col_formatted = 'median_home_value_all_formatted'
 
-# Filter out counties without data for selected bedroom type
-df_filtered_bedrooms = df[df[price_col].notna()].copy()
-
 # Price filter
 st.sidebar.subheader("💰 Home Value")
+price_bounds = bounds[price_col]
 price_min, price_max = st.sidebar.slider(
     "Price Range",
-    min_value=int(df_filtered_bedrooms[price_col].min()),
-    max_value=int(df_filtered_bedrooms[price_col].max()),
-    value=(int(df_filtered_bedrooms[price_col].min()), int(df_filtered_bedrooms[price_col].max())),
+    min_value=price_bounds[0],
+    max_value=price_bounds[1],
+    value=price_bounds,
     step=10000,
     format="$%d"
 )
 
 # Political filters
 st.sidebar.subheader("🗳️ Politics")
-lean_categories = ['Strong Democrat', 'Lean Democrat', 'Swing', 'Lean Republican', 'Strong Republican', 'Unknown']
 selected_leans = st.sidebar.multiselect(
     "Political Lean",
-    options=lean_categories,
-    default=lean_categories
+    options=LEAN_CATEGORIES,
+    default=LEAN_CATEGORIES
 )
 
 # Gun law filter
 st.sidebar.subheader("🔫 Gun Laws")
-gun_law_categories = ['Strong', 'Moderate', 'Weak', 'Very Weak', 'Minimal', 'Unknown']
 selected_gun_laws = st.sidebar.multiselect(
     "Gun Law Strength",
-    options=gun_law_categories,
-    default=gun_law_categories
+    options=GUN_LAW_CATEGORIES,
+    default=GUN_LAW_CATEGORIES
 )
 
 # NEW: Marijuana filter
+selected_marijuana = None
 if 'marijuana_status' in df.columns:
     st.sidebar.subheader("🌿 Marijuana")
-    marijuana_options = sorted(df['marijuana_status'].dropna().unique())
+    marijuana_options = list(df['marijuana_status'].cat.categories)
     selected_marijuana = st.sidebar.multiselect(
         "Marijuana Legality",
         options=marijuana_options,
@@ -95,9 +282,11 @@ if 'marijuana_status' in df.columns:
     )
 
 # NEW: Exotic animal filters
+selected_exotic_ratings = None
+filter_primates = filter_big_cats = filter_reptiles = False
 if 'exotic_animal_rating' in df.columns:
     st.sidebar.subheader("🦎 Exotic Animals")
-    exotic_ratings = sorted(df['exotic_animal_rating'].dropna().unique())
+    exotic_ratings = list(df['exotic_animal_rating'].cat.categories)
     selected_exotic_ratings = st.sidebar.multiselect(
         "Overall Permissiveness",
         options=exotic_ratings,
@@ -112,11 +301,12 @@ if 'exotic_animal_rating' in df.columns:
 
 # Population filter
 st.sidebar.subheader("👥 Population")
+pop_bounds = bounds['population']
 pop_min, pop_max = st.sidebar.slider(
     "Population Range",
-    min_value=int(df['population'].min()),
-    max_value=int(df['population'].max()),
-    value=(int(df['population'].min()), int(df['population'].max())),
+    min_value=pop_bounds[0],
+    max_value=pop_bounds[1],
+    value=pop_bounds,
     step=10000
 )
 
@@ -129,34 +319,26 @@ selected_states = st.sidebar.multiselect(
     default=[]
 )
 
-# Apply filters
-filtered_df = df_filtered_bedrooms[
-    (df_filtered_bedrooms[price_col] >= price_min) &
-    (df_filtered_bedrooms[price_col] <= price_max) &
-    (df_filtered_bedrooms['political_lean'].isin(selected_leans)) &
-    (df_filtered_bedrooms['gun_law_strength'].isin(selected_gun_laws)) &
-    (df_filtered_bedrooms['population'] >= pop_min) &
-    (df_filtered_bedrooms['population'] <= pop_max)
-]
-
-# Marijuana filter
-if 'marijuana_status' in df.columns:
-    filtered_df = filtered_df[filtered_df['marijuana_status'].isin(selected_marijuana)]
-
-# Exotic animal filters
-if 'exotic_animal_rating' in df.columns:
-    filtered_df = filtered_df[filtered_df['exotic_animal_rating'].isin(selected_exotic_ratings)]
-    
-    # Individual animal filters
-    if filter_primates and 'allows_primates' in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df['allows_primates'].isin(['Yes', 'Limited'])]
-    if filter_big_cats and 'allows_big_cats' in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df['allows_big_cats'].isin(['Yes', 'Limited'])]
-    if filter_reptiles and 'allows_reptiles' in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df['allows_reptiles'] == 'Yes']
-
-if selected_states:
-    filtered_df = filtered_df[filtered_df['state_name'].isin(selected_states)]
+# Apply filters - skip the mask entirely when every filter is at its default
+all_defaults = (
+    set(selected_leans) == set(LEAN_CATEGORIES) and
+    set(selected_gun_laws) == set(GUN_LAW_CATEGORIES) and
+    (selected_marijuana is None or set(selected_marijuana) == set(marijuana_options)) and
+    (selected_exotic_ratings is None or set(selected_exotic_ratings) == set(exotic_ratings)) and
+    not (filter_primates or filter_big_cats or filter_reptiles) and
+    not selected_states and
+    (price_min, price_max) == price_bounds and
+    (pop_min, pop_max) == pop_bounds
+)
+if all_defaults:
+    filtered_idx = priced_index(price_col)
+else:
+    filtered_idx = apply_filters(
+        price_col, price_min, price_max, selected_leans, selected_gun_laws,
+        selected_marijuana, selected_exotic_ratings, filter_primates, filter_big_cats,
+        filter_reptiles, pop_min, pop_max, selected_states
+    )
+filtered_df = df.loc[filtered_idx]
 
 # Main content
 col1, col2, col3, col4 = st.columns(4)
@@ -179,8 +361,8 @@ with tab1:
     st.subheader(f"Filtered Counties - {bedroom_type}")
     
     # Build display columns based on available data
-    display_cols = ['county_name', 'state_code', price_col_formatted, 'population', 'political_lean', 'gun_law_grade', 'lean_score']
-    display_names = ['County', 'State', f'{bedroom_type} Value', 'Population', 'Political Lean', 'Gun Grade', 'Lean Score']
+    display_cols = ['county_name', 'state_code', price_col_formatted, *BASE_DISPLAY_COLS]
+    display_names = ['County', 'State', f'{bedroom_type} Value', *BASE_DISPLAY_NAMES]
     
     if 'marijuana_status' in filtered_df.columns:
         display_cols.append('marijuana_status')
@@ -190,8 +372,7 @@ with tab1:
         display_cols.append('exotic_animal_rating')
         display_names.append('Exotic Pets')
     
-    display_df = filtered_df[display_cols].copy()
-    display_df.columns = display_names
+    display_df = filtered_df[display_cols].rename(columns=dict(zip(display_cols, display_names)))
     
     # Sort options
     sort_by = st.selectbox(
@@ -199,7 +380,16 @@ with tab1:
         options=display_names
     )
     
-    display_df = display_df.sort_values(by=sort_by, ascending=(sort_by == 'County'))
+    ascending = (sort_by == 'County')
+    show_all = True
+    if len(display_df) > TABLE_PREVIEW_THRESHOLD:
+        show_all = st.checkbox("Show all rows", value=False, key="show_all_rows")
+    
+    if show_all:
+        display_df = display_df.sort_values(by=sort_by, ascending=ascending)
+    else:
+        st.caption(f"Showing the top {TABLE_PREVIEW_ROWS} of {len(display_df):,} rows by {sort_by}")
+        display_df = top_rows(display_df, sort_by, ascending, TABLE_PREVIEW_ROWS)
     
     st.dataframe(
         display_df,
@@ -209,7 +399,7 @@ with tab1:
     )
     
     # Download button
-    csv = filtered_df.to_csv(index=False)
+    csv = make_csv(filtered_idx)
     st.download_button(
         label="Download Results as CSV",
         data=csv,
@@ -221,38 +411,10 @@ with tab2:
     st.subheader("County Map")
     
     if len(filtered_df) > 0:
-        fig = px.scatter_geo(
-            filtered_df,
-            locations='state_code',
-            locationmode='USA-states',
-            color=price_col,
-            hover_name='county_name',
-            hover_data={
-                'state_code': False,
-                price_col: ':$,.0f',
-                'population': ':,',
-                'political_lean': True,
-                'gun_law_grade': True,
-                'marijuana_status': True if 'marijuana_status' in filtered_df.columns else False,
-                'exotic_animal_rating': True if 'exotic_animal_rating' in filtered_df.columns else False
-            },
-            size='population',
-            color_continuous_scale='Viridis',
-            scope='usa',
-            title=f'{len(filtered_df)} Counties Matching Your Criteria'
-        )
-        
-        fig.update_layout(
-            height=600,
-            geo=dict(
-                scope='usa',
-                showland=True,
-                landcolor='rgb(243, 243, 243)',
-                coastlinecolor='rgb(204, 204, 204)',
-            )
-        )
-        
+        fig = go.Figure(build_map(filtered_idx, price_col))
         st.plotly_chart(fig, use_container_width=True)
+        if len(filtered_df) > MAP_MAX_MARKERS:
+            st.caption(f"Showing {MAP_MAX_MARKERS} of {len(filtered_df):,} counties; largest by population")
     else:
         st.warning("No counties match your filters. Try adjusting your criteria.")
 
@@ -264,23 +426,12 @@ with tab3:
         
         with col1:
             # Political lean distribution
-            lean_counts = filtered_df['political_lean'].value_counts()
-            fig1 = px.pie(
-                values=lean_counts.values,
-                names=lean_counts.index,
-                title="Political Lean Distribution"
-            )
+            fig1 = go.Figure(build_count_pie('political_lean', filtered_idx, "Political Lean Distribution"))
             st.plotly_chart(fig1, use_container_width=True)
         
         with col2:
             # Gun law grade distribution
-            gun_counts = filtered_df['gun_law_grade'].value_counts().sort_index()
-            fig2 = px.bar(
-                x=gun_counts.index,
-                y=gun_counts.values,
-                title="Gun Law Grade Distribution",
-                labels={'x': 'Grade', 'y': 'Number of Counties'}
-            )
+            fig2 = go.Figure(build_count_bar('gun_law_grade', filtered_idx, "Gun Law Grade Distribution", 'Grade', sort_index=True))
             st.plotly_chart(fig2, use_container_width=True)
         
         # NEW: Marijuana & Exotic Animals charts
@@ -288,39 +439,15 @@ with tab3:
             col3, col4 = st.columns(2)
             
             with col3:
-                marijuana_counts = filtered_df['marijuana_status'].value_counts()
-                fig_mj = px.bar(
-                    x=marijuana_counts.index,
-                    y=marijuana_counts.values,
-                    title="Marijuana Legality Distribution",
-                    labels={'x': 'Status', 'y': 'Number of Counties'}
-                )
+                fig_mj = go.Figure(build_count_bar('marijuana_status', filtered_idx, "Marijuana Legality Distribution", 'Status'))
                 st.plotly_chart(fig_mj, use_container_width=True)
             
             with col4:
-                exotic_counts = filtered_df['exotic_animal_rating'].value_counts()
-                fig_ex = px.bar(
-                    x=exotic_counts.index,
-                    y=exotic_counts.values,
-                    title="Exotic Pet Laws Distribution",
-                    labels={'x': 'Permissiveness', 'y': 'Number of Counties'}
-                )
+                fig_ex = go.Figure(build_count_bar('exotic_animal_rating', filtered_idx, "Exotic Pet Laws Distribution", 'Permissiveness'))
                 st.plotly_chart(fig_ex, use_container_width=True)
         
         # Price vs Population scatter
-        fig3 = px.scatter(
-            filtered_df,
-            x='population',
-            y=price_col,
-            color='political_lean',
-            hover_name='county_name',
-            title=f'{bedroom_type} Value vs Population',
-            labels={
-                'population': 'Population',
-                price_col: f'{bedroom_type} Median Value ($)'
-            }
-        )
-        fig3.update_xaxes(type='log')
+        fig3 = go.Figure(build_scatter(filtered_idx, price_col, bedroom_type))
         st.plotly_chart(fig3, use_container_width=True)
         
         # Top 10 affordable counties
@@ -328,8 +455,9 @@ with tab3:
         affordable_cols = ['county_name', 'state_code', price_col_formatted, 'population', 'political_lean', 'gun_law_grade']
         affordable_names = ['County', 'State', 'Home Value', 'Population', 'Political Lean', 'Gun Grade']
         
-        affordable = filtered_df.nsmallest(10, price_col)[affordable_cols]
-        affordable.columns = affordable_names
+        affordable = filtered_df.nsmallest(10, price_col)[affordable_cols].rename(
+            columns=dict(zip(affordable_cols, affordable_names))
+        )
         st.dataframe(affordable, hide_index=True, use_container_width=True)
     else:
         st.warning("No counties to analyze. Adjust your filters.")
@@ -6,6 +6,25 @@ import pandas as pd
 import numpy as np
 import os
 
+# Fixed category order for each filter column - also the option lists the app offers
+CATEGORY_ORDERS = {
+    'political_lean': ('Strong Democrat', 'Lean Democrat', 'Swing', 'Lean Republican', 'Strong Republican', 'Unknown'),
+    'gun_law_strength': ('Strong', 'Moderate', 'Weak', 'Very Weak', 'Minimal', 'Unknown'),
+    'marijuana_status': ('Fully Legal', 'Medical Only', 'Decriminalized', 'CBD Only', 'Fully Illegal'),
+    'exotic_animal_rating': ('Permissive', 'Moderate', 'Restrictive', 'Very Restrictive'),
+}
+
+def read_zhvi(path, value_col, extra_cols=()):
+    """Read a Zillow ZHVI file, keeping only the FIPS columns, extra_cols and the latest month as value_col"""
+    header_cols = pd.read_csv(path, nrows=0).columns.tolist()
+    last_date = [col for col in header_cols if col.startswith('20')][-1]
+    housing = pd.read_csv(
+        path,
+        usecols=['StateCodeFIPS', 'MunicipalCodeFIPS', *extra_cols, last_date],
+        dtype={'StateCodeFIPS': 'int16', 'MunicipalCodeFIPS': 'int16'}
+    )
+    return housing.rename(columns={last_date: value_col})
+
 def prepare_data():
     print("Loading data files...")
     
@@ -18,17 +37,26 @@ def prepare_data():
     
     # 1. Load ALL housing data files
     print("Loading housing data (all bedroom types)...")
-    housing_general = pd.read_csv(f'{data_path}County_zhvi_uc_sfr_tier_0.33_0.67_sm_sa_month.csv')
+    housing_general = read_zhvi(
+        f'{data_path}County_zhvi_uc_sfr_tier_0.33_0.67_sm_sa_month.csv',
+        'median_home_value_all', extra_cols=['RegionName', 'StateName', 'State']
+    )
     
     try:
-        housing_4br = pd.read_csv(f'{data_path}County_zhvi_bdrmcnt_4_uc_sfrcondo_tier_0.33_0.67_sm_sa_month (1).csv')
+        housing_4br = read_zhvi(
+            f'{data_path}County_zhvi_bdrmcnt_4_uc_sfrcondo_tier_0.33_0.67_sm_sa_month (1).csv',
+            'median_home_value_4br'
+        )
         print("✓ Loaded 4-bedroom data")
     except:
         print("⚠ 4-bedroom file not found")
         housing_4br = None
     
     try:
-        housing_5br = pd.read_csv(f'{data_path}County_zhvi_bdrmcnt_5_uc_sfrcondo_tier_0.33_0.67_sm_sa_month (1).csv')
+        housing_5br = read_zhvi(
+            f'{data_path}County_zhvi_bdrmcnt_5_uc_sfrcondo_tier_0.33_0.67_sm_sa_month (1).csv',
+            'median_home_value_5br'
+        )
         print("✓ Loaded 5-bedroom data")
     except:
         print("⚠ 5-bedroom file not found")
@@ -36,13 +64,9 @@ def prepare_data():
     
     # Process general housing
     housing_general['county_fips'] = (
-        housing_general['StateCodeFIPS'].astype(str).str.zfill(2) + 
-        housing_general['MunicipalCodeFIPS'].astype(str).str.zfill(3)
-    ).astype(float)
-    
-    date_cols = [col for col in housing_general.columns if col.startswith('20')]
-    housing_general['median_home_value'] = housing_general[date_cols[-1]]
-    housing_general['median_home_value_all'] = housing_general['median_home_value']
+        housing_general['StateCodeFIPS'].astype('int64') * 1000 +
+        housing_general['MunicipalCodeFIPS'].astype('int64')
+    )
     
     housing_clean = housing_general[['county_fips', 'RegionName', 'StateName', 'State', 'median_home_value_all']].copy()
     housing_clean.columns = ['county_fips', 'county_name', 'state_name', 'state_code', 'median_home_value_all']
@@ -50,26 +74,22 @@ def prepare_data():
     # Add 4-bedroom data
     if housing_4br is not None:
         housing_4br['county_fips'] = (
-            housing_4br['StateCodeFIPS'].astype(str).str.zfill(2) + 
-            housing_4br['MunicipalCodeFIPS'].astype(str).str.zfill(3)
-        ).astype(float)
-        date_cols_4 = [col for col in housing_4br.columns if col.startswith('20')]
-        housing_4br['median_home_value_4br'] = housing_4br[date_cols_4[-1]]
-        housing_clean = housing_clean.merge(
-            housing_4br[['county_fips', 'median_home_value_4br']], 
+            housing_4br['StateCodeFIPS'].astype('int64') * 1000 +
+            housing_4br['MunicipalCodeFIPS'].astype('int64')
+        )
+        housing_clean = housing_clean.join(
+            housing_4br.set_index('county_fips')[['median_home_value_4br']],
             on='county_fips', how='left'
         )
     
     # Add 5-bedroom data
     if housing_5br is not None:
         housing_5br['county_fips'] = (
-            housing_5br['StateCodeFIPS'].astype(str).str.zfill(2) + 
-            housing_5br['MunicipalCodeFIPS'].astype(str).str.zfill(3)
-        ).astype(float)
-        date_cols_5 = [col for col in housing_5br.columns if col.startswith('20')]
-        housing_5br['median_home_value_5br'] = housing_5br[date_cols_5[-1]]
-        housing_clean = housing_clean.merge(
-            housing_5br[['county_fips', 'median_home_value_5br']], 
+            housing_5br['StateCodeFIPS'].astype('int64') * 1000 +
+            housing_5br['MunicipalCodeFIPS'].astype('int64')
+        )
+        housing_clean = housing_clean.join(
+            housing_5br.set_index('county_fips')[['median_home_value_5br']],
             on='county_fips', how='left'
         )
     
@@ -77,27 +97,26 @@ def prepare_data():
     
     # 2. Load and process election data
     elections = pd.read_csv(f'{data_path}countypres_2000-2024.csv')
-    elec_2024 = elections[elections['year'] == 2024].copy()
-    
-    elec_pivot = elec_2024.pivot_table(
-        index=['state_po', 'county_name', 'county_fips'],
-        columns='party',
-        values='candidatevotes',
-        aggfunc='sum',
-        fill_value=0
-    ).reset_index()
-    
-    if 'DEMOCRAT' not in elec_pivot.columns:
-        elec_pivot['DEMOCRAT'] = 0
-    if 'REPUBLICAN' not in elec_pivot.columns:
-        elec_pivot['REPUBLICAN'] = 0
-        
-    elec_pivot['total_votes'] = elec_pivot.get('DEMOCRAT', 0) + elec_pivot.get('REPUBLICAN', 0)
-    elec_pivot['dem_pct'] = (elec_pivot.get('DEMOCRAT', 0) / elec_pivot['total_votes'] * 100).round(1)
-    elec_pivot['rep_pct'] = (elec_pivot.get('REPUBLICAN', 0) / elec_pivot['total_votes'] * 100).round(1)
-    elec_pivot['lean_score'] = (elec_pivot['dem_pct'] - elec_pivot['rep_pct']).round(1)
-    
-    elec_clean = elec_pivot[['county_fips', 'dem_pct', 'rep_pct', 'lean_score']].copy()
+    elec_2024 = elections[
+        (elections['year'] == 2024) &
+        elections['county_fips'].notna() &
+        elections['party'].isin(['DEMOCRAT', 'REPUBLICAN'])
+    ].assign(county_fips=lambda d: d['county_fips'].astype('int64'))
+    
+    # Group on state, county name and FIPS; some source rows carry a neighbouring county's FIPS
+    elec_votes = (
+        elec_2024.groupby(['state_po', 'county_name', 'county_fips', 'party'])['candidatevotes'].sum()
+        .unstack('party', fill_value=0)
+        .reindex(columns=['DEMOCRAT', 'REPUBLICAN'], fill_value=0)
+        .reset_index()
+    )
+    
+    elec_votes['total_votes'] = elec_votes['DEMOCRAT'] + elec_votes['REPUBLICAN']
+    elec_votes['dem_pct'] = (elec_votes['DEMOCRAT'] / elec_votes['total_votes'] * 100).round(1)
+    elec_votes['rep_pct'] = (elec_votes['REPUBLICAN'] / elec_votes['total_votes'] * 100).round(1)
+    elec_votes['lean_score'] = (elec_votes['dem_pct'] - elec_votes['rep_pct']).round(1)
+    
+    elec_clean = elec_votes[['county_fips', 'dem_pct', 'rep_pct', 'lean_score']]
     print(f"Processed {len(elec_clean)} counties with 2024 election data")
     
     # 3. Load gun law grades
@@ -105,6 +124,7 @@ def prepare_data():
     
     # 4. Load population data
     population = pd.read_csv(f'{data_path}county_population_estimates.csv')
+    population['county_fips'] = population['county_fips'].astype('int64')
     
     # 5. Load NEW data - exotic animals
     try:
@@ -125,24 +145,24 @@ def prepare_data():
     # 7. Merge everything
     print("\nMerging datasets...")
     
-    merged = housing_clean.copy()
-    merged = merged.merge(elec_clean, on='county_fips', how='left')
-    merged = merged.merge(gun_laws[['state_code', 'gun_law_grade', 'gun_death_rate']], 
-                         left_on='state_code', right_on='state_code', how='left')
-    merged = merged.merge(population[['county_fips', 'population']], 
+    # Lookup tables are indexed on their key once; join probes that index directly
+    merged = housing_clean.join(elec_clean.set_index('county_fips'), on='county_fips', how='left')
+    merged = merged.join(gun_laws.set_index('state_code')[['gun_law_grade', 'gun_death_rate']],
+                         on='state_code', how='left')
+    merged = merged.join(population.set_index('county_fips')[['population']],
                          on='county_fips', how='left')
     
     # Add exotic animal laws
     if exotic_animals is not None:
-        merged = merged.merge(
-            exotic_animals[['state_code', 'exotic_animal_rating', 'allows_primates', 'allows_big_cats', 'allows_reptiles']], 
+        merged = merged.join(
+            exotic_animals.set_index('state_code')[['exotic_animal_rating', 'allows_primates', 'allows_big_cats', 'allows_reptiles']],
             on='state_code', how='left'
         )
     
     # Add marijuana legality
     if marijuana is not None:
-        merged = merged.merge(
-            marijuana[['state_code', 'marijuana_status', 'recreational_legal', 'medical_legal', 'permissiveness_score']], 
+        merged = merged.join(
+            marijuana.set_index('state_code')[['marijuana_status', 'recreational_legal', 'medical_legal', 'permissiveness_score']],
             on='state_code', how='left'
         )
     
@@ -150,61 +170,50 @@ def prepare_data():
     merged = merged.dropna(subset=['median_home_value_all'])
     
     # Create derived fields
-    merged['median_home_value_all_formatted'] = merged['median_home_value_all'].apply(
-        lambda x: f"${x:,.0f}" if pd.notna(x) else "N/A"
+    for col in ['median_home_value_all', 'median_home_value_4br', 'median_home_value_5br']:
+        if col in merged.columns:
+            values = merged[col]
+            merged[f'{col}_formatted'] = np.where(
+                values.notna(), '$' + values.fillna(0).map('{:,.0f}'.format), 'N/A'
+            )
+    
+    # Political lean category (bins are right-inclusive: -20 is Strong Republican, 20 is Lean Democrat)
+    lean_bins = [-np.inf, -20, -5, 5, 20, np.inf]
+    lean_labels = ['Strong Republican', 'Lean Republican', 'Swing', 'Lean Democrat', 'Strong Democrat']
+    has_score = merged['lean_score'].notna()
+    merged['political_lean'] = pd.Series('Unknown', index=merged.index, dtype='object')
+    merged.loc[has_score, 'political_lean'] = (
+        pd.cut(merged.loc[has_score, 'lean_score'], bins=lean_bins, labels=lean_labels).astype(object)
     )
     
-    if 'median_home_value_4br' in merged.columns:
-        merged['median_home_value_4br_formatted'] = merged['median_home_value_4br'].apply(
-            lambda x: f"${x:,.0f}" if pd.notna(x) else "N/A"
-        )
-    
-    if 'median_home_value_5br' in merged.columns:
-        merged['median_home_value_5br_formatted'] = merged['median_home_value_5br'].apply(
-            lambda x: f"${x:,.0f}" if pd.notna(x) else "N/A"
-        )
+    # Gun law category (any unlisted grade, e.g. F, is Minimal)
+    grade_map = {
+        'A+': 'Strong', 'A': 'Strong', 'A-': 'Strong',
+        'B+': 'Moderate', 'B': 'Moderate', 'B-': 'Moderate',
+        'C+': 'Weak', 'C': 'Weak', 'C-': 'Weak',
+        'D+': 'Very Weak', 'D': 'Very Weak', 'D-': 'Very Weak',
+    }
+    has_grade = merged['gun_law_grade'].notna()
+    merged['gun_law_strength'] = pd.Series('Unknown', index=merged.index, dtype='object')
+    merged.loc[has_grade, 'gun_law_strength'] = (
+        merged.loc[has_grade, 'gun_law_grade'].map(grade_map).fillna('Minimal')
+    )
     
-    # Political lean category
-    def categorize_lean(score):
-        if pd.isna(score):
-            return "Unknown"
-        elif score > 20:
-            return "Strong Democrat"
-        elif score > 5:
-            return "Lean Democrat"
-        elif score > -5:
-            return "Swing"
-        elif score > -20:
-            return "Lean Republican"
-        else:
-            return "Strong Republican"
-    
-    merged['political_lean'] = merged['lean_score'].apply(categorize_lean)
-    
-    # Gun law category
-    def categorize_gun_law(grade):
-        if pd.isna(grade):
-            return "Unknown"
-        elif grade in ['A+', 'A', 'A-']:
-            return "Strong"
-        elif grade in ['B+', 'B', 'B-']:
-            return "Moderate"
-        elif grade in ['C+', 'C', 'C-']:
-            return "Weak"
-        elif grade in ['D+', 'D', 'D-']:
-            return "Very Weak"
-        else:
-            return "Minimal"
-    
-    merged['gun_law_strength'] = merged['gun_law_grade'].apply(categorize_gun_law)
+    # Store filter columns as ordered categoricals; values missing from CATEGORY_ORDERS would become NaN
+    for col, categories in CATEGORY_ORDERS.items():
+        if col in merged.columns:
+            unexpected = set(merged[col].dropna().unique()) - set(categories)
+            if unexpected:
+                raise ValueError(f"Unexpected {col} values {sorted(unexpected)} - add them to CATEGORY_ORDERS")
+            merged[col] = pd.Categorical(merged[col], categories=categories, ordered=True)
     
     # Save
     if not os.path.exists('data'):
         os.makedirs('data')
         print("\n✓ Created data/ folder")
     
-    output_path = 'data/merged_county_data.csv'
-    merged.to_csv(output_path, index=False)
+    output_path = 'data/merged_county_data.feather'
+    merged.reset_index(drop=True).to_feather(output_path)
     
     print(f"\n✓ Successfully merged data for {len(merged)} counties")
     print(f"✓ Saved to: {output_path}")